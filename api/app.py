@@ -1,24 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import importlib
 from contextlib import asynccontextmanager
+from datetime import datetime  # noqa: TC003
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Annotated, Final
 
-import genshin
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Response, Security
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Response, Security
 from fastapi.responses import FileResponse, JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from prisma import Prisma
-from prisma.enums import CodeStatus, Game
+from loguru import logger
+from prisma import Prisma, get_client
+from prisma.enums import CodeChangeKind, CodeStatus, Game
 from prisma.models import RedeemCode
 
-from .codes.status_verifier import verify_code_status
-from .codes.task import check_codes as run_check_codes
-from .codes.task import update_codes as run_update_codes
+from .cache import cache, codes_generation_name, codes_key
+from .changes import add_code, get_changes, get_latest_change_id, record_change, serialize_changes
 from .config import settings
 from .logging import setup_logging
-from .models import CreateCode  # noqa: TC001
+from .middleware import CoalesceMiddleware, RateLimitMiddleware
+from .models import BatchCodes, CreateCode  # noqa: TC001
+from .snapshot import codes_changed, get_snapshot, load_snapshot, refresh_snapshot, serialize_codes
 from .utils import get_cookies, get_project_version
 
 if TYPE_CHECKING:
@@ -26,27 +30,93 @@ if TYPE_CHECKING:
 
     from fastapi.security import HTTPAuthorizationCredentials
 
+# Modules only needed to scrape and verify codes (genshin, BeautifulSoup, etc.) are
+# imported where they are used, so the app can start serving requests sooner.
+
+MAX_CONNECT_RETRY_DELAY: Final[float] = 60
 
 scheduler = AsyncIOScheduler()
+ready = asyncio.Event()
+init_failed = asyncio.Event()
+
+
+async def connect_with_retry(db: Prisma) -> None:
+    """Connect to the database, retrying with exponential backoff until it succeeds."""
+    delay = 1.0
+    while True:
+        try:
+            await db.connect()
+        except Exception:
+            logger.exception(f"Failed to connect to the database, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_CONNECT_RETRY_DELAY)
+        else:
+            return
+
+
+def on_initialize_done(task: asyncio.Task[None]) -> None:
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.opt(exception=task.exception()).error("Failed to initialize the app")
+    init_failed.set()
+
+
+async def initialize(db: Prisma) -> None:
+    """Connect to the database and schedule tasks."""
+    if settings.fast_startup:
+        await connect_with_retry(db)
+    else:
+        # Fail the startup, so the server exits instead of running without a database
+        await db.connect()
+
+    # The scheduler imports the tasks as soon as they are added. Import their module (genshin,
+    # BeautifulSoup, etc.) in a thread first, so requests are still served in the meantime.
+    await asyncio.to_thread(importlib.import_module, "api.codes.task")
+    scheduler.add_job("api.codes.task:update_codes", "interval", hours=1, id="update_codes")
+    scheduler.add_job(
+        "api.codes.task:check_codes",
+        "cron",
+        hour=1,
+        minute=30,
+        timezone="Asia/Taipei",
+        id="check_codes",
+    )
+    if settings.snapshot_enabled:
+        await refresh_snapshot()
+        scheduler.add_job(
+            refresh_snapshot, "interval", seconds=settings.snapshot_interval, id="refresh_snapshot"
+        )
+    scheduler.start()
+
+    ready.set()
+    logger.info("App is ready")
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
     """Context manager to contol the lifespan of the FastAPI app."""
     db = Prisma(auto_register=True)
-    await db.connect()
+    if settings.snapshot_enabled:
+        await load_snapshot()
 
-    # Schedule tasks
-    scheduler.add_job(run_update_codes, "interval", hours=1, id="update_codes")
-    scheduler.add_job(
-        run_check_codes, "cron", hour=1, minute=30, timezone="Asia/Taipei", id="check_codes"
-    )
-    scheduler.start()
+    init_task: asyncio.Task[None] | None = None
+    if settings.fast_startup:
+        # Start serving right away, /ready tells when the database is connected
+        init_task = asyncio.create_task(initialize(db))
+        init_task.add_done_callback(on_initialize_done)
+    else:
+        await initialize(db)
 
     yield
 
-    scheduler.shutdown()
-    await db.disconnect()
+    if init_task is not None and not init_task.done():
+        init_task.cancel()
+    if scheduler.running:
+        scheduler.shutdown()
+    if db.is_connected():
+        await db.disconnect()
+    await cache.close()
+    await logger.complete()
 
 
 setup_logging()
@@ -57,6 +127,15 @@ app = FastAPI(
         {"url": "http://127.0.0.1:1078", "description": "Local development server"},
     ],
 )
+# Added last so it runs first, rate limited requests never join a coalesced one
+if settings.coalesce_requests:
+    app.add_middleware(CoalesceMiddleware)
+if settings.rate_limit_requests > 0:
+    app.add_middleware(
+        RateLimitMiddleware,
+        requests=settings.rate_limit_requests,
+        window=settings.rate_limit_window,
+    )
 security = HTTPBearer(auto_error=True)
 
 
@@ -77,9 +156,29 @@ async def root() -> Response:
 
 @app.get("/health")
 async def health_check() -> Response:
+    if init_failed.is_set():
+        # The app won't ever become ready, so let it be restarted
+        return JSONResponse(content={"status": "failed"}, status_code=503)
     return JSONResponse(content={"status": "ok"})
 
 
+@app.get("/ready")
+async def readiness_check() -> Response:
+    if not ready.is_set():
+        return JSONResponse(content={"status": "starting"}, status_code=503)
+    return JSONResponse(content={"status": "ready"})
+
+
+async def require_ready() -> None:
+    """Wait for the app to be ready before handling requests that need the database."""
+    if ready.is_set():
+        return
+    try:
+        await asyncio.wait_for(ready.wait(), timeout=settings.ready_timeout)
+    except TimeoutError:
+        raise HTTPException(status_code=503, detail="Service is starting") from None
+
+
 @app.get("/favicon.ico")
 def get_favicon() -> Response:
     return Response(status_code=204)
@@ -87,9 +186,50 @@ def get_favicon() -> Response:
 
 @app.get("/codes")
 async def get_codes(game: Game) -> Response:
-    codes = await RedeemCode.prisma().find_many(where={"game": game, "status": CodeStatus.OK})
-    return JSONResponse(
-        content={"codes": [code.model_dump() for code in codes], "game": game.value}
+    snapshot = get_snapshot() if settings.snapshot_enabled else None
+    if snapshot is not None and game.value in snapshot.responses:
+        return Response(
+            content=snapshot.responses[game.value],
+            media_type="application/json",
+            headers={"X-Snapshot-Age": f"{snapshot.age:.1f}"},
+        )
+
+    await require_ready()
+    # Read before querying, so codes queried before a write are never cached as current
+    generation = await cache.get_generation(codes_generation_name(game.value))
+    cache_key = codes_key(game.value, generation)
+    content = await cache.get(cache_key)
+    if content is None:
+        codes = await RedeemCode.prisma().find_many(where={"game": game, "status": CodeStatus.OK})
+        content = serialize_codes(codes, game)
+        await cache.set(cache_key, content, ttl=settings.codes_cache_ttl)
+
+    return Response(content=content, media_type="application/json")
+
+
+@app.get("/codes/changes")
+async def get_code_changes(
+    after_id: int | None = None,
+    since: datetime | None = None,
+    game: Game | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 500,
+) -> Response:
+    if after_id is not None and since is not None:
+        raise HTTPException(status_code=400, detail="Only one of after_id and since can be set")
+
+    await require_ready()
+    changes, has_more = await get_changes(after_id=after_id, since=since, game=game, limit=limit)
+    if changes:
+        next_id = changes[-1].id
+    elif after_id is not None:
+        next_id = after_id
+    else:
+        # Nothing changed since then, so continue from the latest change
+        next_id = await get_latest_change_id()
+
+    return Response(
+        content=serialize_changes(changes, next_id=next_id, has_more=has_more),
+        media_type="application/json",
     )
 
 
@@ -104,8 +244,12 @@ async def get_version() -> Response:
     return JSONResponse(content={"version": version})
 
 
-@app.post("/codes", dependencies=[Security(validate_token)])
+@app.post("/codes", dependencies=[Security(validate_token), Depends(require_ready)])
 async def create_code(code: CreateCode) -> Response:
+    import genshin  # noqa: PLC0415
+
+    from .codes.status_verifier import verify_code_status  # noqa: PLC0415
+
     existing = await RedeemCode.prisma().find_first(where={"code": code.code, "game": code.game})
     if existing is not None:
         raise HTTPException(status_code=400, detail="Code already exists")
@@ -115,38 +259,77 @@ async def create_code(code: CreateCode) -> Response:
         raise HTTPException(status_code=400, detail=f"No cookies set for {code.game.value!r}")
 
     status, _ = await verify_code_status(cookies, code.code, genshin.Game(code.game.value))
-    await RedeemCode.prisma().create(
-        {"code": code.code, "game": code.game, "rewards": "", "status": status}
-    )
+    async with get_client().tx() as tx:
+        await add_code(tx, code.code, code.game, status)
+    await codes_changed(code.game)
     return Response(status_code=201)
 
 
-@app.delete("/codes/{code_id}", dependencies=[Security(validate_token)])
+@app.post("/codes/batch", dependencies=[Security(validate_token), Depends(require_ready)])
+async def create_codes_batch(batch: BatchCodes, background_tasks: BackgroundTasks) -> Response:
+    from .codes.batch import create_job, run_job  # noqa: PLC0415
+
+    job = create_job(batch.codes, save=True)
+    background_tasks.add_task(run_job, job)
+    return JSONResponse(content={"job_id": job.id}, status_code=202)
+
+
+@app.delete("/codes/{code_id}", dependencies=[Security(validate_token), Depends(require_ready)])
 async def delete_code(code_id: int) -> Response:
     code = await RedeemCode.prisma().find_unique(where={"id": code_id})
     if not code:
         raise HTTPException(status_code=404, detail="Code not found")
-    await RedeemCode.prisma().delete(where={"id": code_id})
+    async with get_client().tx() as tx:
+        await RedeemCode.prisma(tx).delete(where={"id": code_id})
+        await record_change(tx, code, CodeChangeKind.DELETED)
+    await codes_changed(code.game)
     return Response(status_code=204)
 
 
-@app.post("/update-codes", dependencies=[Security(validate_token)])
+@app.post("/update-codes", dependencies=[Security(validate_token), Depends(require_ready)])
 async def update_codes_endpoint(background_tasks: BackgroundTasks) -> Response:
-    background_tasks.add_task(run_update_codes)
+    from .codes.task import update_codes  # noqa: PLC0415
+
+    background_tasks.add_task(update_codes)
     return Response(status_code=202)
 
 
-@app.post("/check-codes", dependencies=[Security(validate_token)])
+@app.post("/check-codes", dependencies=[Security(validate_token), Depends(require_ready)])
 async def check_codes_endpoint(background_tasks: BackgroundTasks) -> Response:
-    background_tasks.add_task(run_check_codes)
+    from .codes.task import check_codes  # noqa: PLC0415
+
+    background_tasks.add_task(check_codes)
     return Response(status_code=202)
 
 
-@app.post("/check-code", dependencies=[Security(validate_token)])
+@app.post("/check-code", dependencies=[Security(validate_token), Depends(require_ready)])
 async def check_code_endpoint(code: str, game: Game) -> Response:
+    import genshin  # noqa: PLC0415
+
+    from .codes.status_verifier import verify_code_status  # noqa: PLC0415
+
     cookies = await get_cookies(game)
     if cookies is None:
         raise HTTPException(status_code=400, detail=f"No cookies set for {game.value!r}")
 
     status, redeemed = await verify_code_status(cookies, code, genshin.Game(game.value))
     return JSONResponse(content={"status": status.value, "redeemed": redeemed})
+
+
+@app.post("/check-code/batch", dependencies=[Security(validate_token), Depends(require_ready)])
+async def check_codes_batch(batch: BatchCodes, background_tasks: BackgroundTasks) -> Response:
+    from .codes.batch import create_job, run_job  # noqa: PLC0415
+
+    job = create_job(batch.codes, save=False)
+    background_tasks.add_task(run_job, job)
+    return JSONResponse(content={"job_id": job.id}, status_code=202)
+
+
+@app.get("/jobs/{job_id}", dependencies=[Security(validate_token)])
+async def get_job(job_id: str) -> Response:
+    from .codes.batch import jobs  # noqa: PLC0415
+
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content={**job.model_dump(mode="json"), "finished": job.finished})
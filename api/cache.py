@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Literal
+
+from .config import settings
+
+
+class Cache(ABC):
+    """Key-value cache for bytes with per-entry TTL."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """Invalidate keys, every process sharing the backend sees it."""
+
+    @abstractmethod
+    async def get_generation(self, name: str) -> int:
+        """Get the generation of a group of entries, for use in their keys."""
+
+    @abstractmethod
+    async def bump_generation(self, name: str) -> None:
+        """Invalidate a group of entries, every process sharing the backend sees it.
+
+        Unlike deleting a key, this also invalidates values computed before the bump but only
+        set after it, since they are set under the key of the old generation.
+        """
+
+    async def close(self) -> None:
+        return
+
+
+class MemoryCache(Cache):
+    """In-process LRU cache, only consistent within a single worker."""
+
+    def __init__(self, *, max_entries: int = 1024) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def get_generation(self, name: str) -> int:
+        return self._generations.get(name, 0)
+
+    async def bump_generation(self, name: str) -> None:
+        self._generations[name] = self._generations.get(name, 0) + 1
+
+
+class SQLiteCache(Cache):
+    """Cache stored in a local SQLite file, shared by every worker on the same host."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations "
+                "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> bytes | None:
+        query = "SELECT value FROM cache WHERE key = ? AND expires_at > ?"
+        with self._lock:
+            row = self._connect().execute(query, (key, time.time())).fetchone()
+        return None if row is None else row[0]
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            conn.commit()
+
+    def _delete(self, keys: tuple[str, ...]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+            conn.commit()
+
+    def _get_generation(self, name: str) -> int:
+        query = "SELECT value FROM generations WHERE name = ?"
+        with self._lock:
+            row = self._connect().execute(query, (name,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def _bump_generation(self, name: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO generations (name, value) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+                (name,),
+            )
+            conn.commit()
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, *, ttl: float) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, *keys: str) -> None:
+        await asyncio.to_thread(self._delete, keys)
+
+    async def get_generation(self, name: str) -> int:
+        return await asyncio.to_thread(self._get_generation, name)
+
+    async def bump_generation(self, name: str) -> None:
+        await asyncio.to_thread(self._bump_generation, name)
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_cache(backend: Literal["memory", "sqlite"], path: str) -> Cache:
+    if backend == "sqlite":
+        return SQLiteCache(path)
+    return MemoryCache()
+
+
+def codes_generation_name(game: str) -> str:
+    return f"codes:{game}"
+
+
+def codes_key(game: str, generation: int) -> str:
+    return f"codes:{game}:{generation}"
+
+
+cache = create_cache(settings.cache_backend, settings.cache_path)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Final
+
+import orjson
+from prisma.enums import CodeChangeKind, CodeStatus
+from prisma.models import CodeChange, RedeemCode
+
+from .codes.rewards import rewards_to_json
+
+if TYPE_CHECKING:
+    from prisma import Prisma
+    from prisma.enums import Game
+    from prisma.types import CodeChangeWhereInput
+
+# Key of the Postgres advisory lock held by transactions that write to the change log
+CHANGE_LOG_LOCK_KEY: Final[int] = 0x686F796F
+
+
+async def record_change(tx: Prisma, code: RedeemCode, kind: CodeChangeKind) -> None:
+    """Append the current state of a code to the change log.
+
+    Must be called in the transaction that changed the code, so the change can't be lost.
+    """
+    # Clients page through the log by ID, so IDs must be committed in the order they are
+    # taken. Holding the lock until the transaction ends only lets one writer at a time in.
+    await tx.execute_raw("SELECT pg_advisory_xact_lock($1)", CHANGE_LOG_LOCK_KEY)
+    await CodeChange.prisma(tx).create(
+        data={
+            "code_id": code.id,
+            "code": code.code,
+            "game": code.game,
+            "kind": kind,
+            "status": code.status,
+            "rewards": code.rewards,
+            "items": code.items,
+        }
+    )
+
+
+async def add_code(  # noqa: PLR0913
+    tx: Prisma, code: str, game: Game, status: CodeStatus, *, rewards: str = "", items: str = ""
+) -> RedeemCode:
+    """Save a newly verified code and log its creation, in the transaction ``tx``."""
+    now = datetime.now(UTC)
+    row = await RedeemCode.prisma(tx).create(
+        data={
+            "code": code,
+            "game": game,
+            "status": status,
+            "rewards": rewards,
+            "items": items,
+            "verified_at": now,
+            "expired_at": now if status is CodeStatus.NOT_OK else None,
+        }
+    )
+    await record_change(tx, row, CodeChangeKind.CREATED)
+    return row
+
+
+async def get_changes(
+    *, after_id: int | None = None, since: datetime | None = None, game: Game | None, limit: int
+) -> tuple[list[CodeChange], bool]:
+    """Get the changes after the change with ID ``after_id``, or made after ``since``.
+
+    Changes are paged by their ID rather than their time, which can be earlier than the time
+    of a change committed before them. ``record_change`` serializes the writers, so a change
+    is never committed after one with a greater ID. Use the ID of the last change as
+    ``after_id`` to get the next page.
+
+    Returns:
+        The changes, oldest first, and whether there are more after them.
+    """
+    where: CodeChangeWhereInput = {}
+    if after_id is not None:
+        where["id"] = {"gt": after_id}
+    elif since is not None:
+        where["created_at"] = {"gt": since if since.tzinfo else since.replace(tzinfo=UTC)}
+    if game is not None:
+        where["game"] = game
+
+    changes = await CodeChange.prisma().find_many(where=where, order={"id": "asc"}, take=limit + 1)
+    return changes[:limit], len(changes) > limit
+
+
+async def get_latest_change_id() -> int:
+    change = await CodeChange.prisma().find_first(order={"id": "desc"})
+    return 0 if change is None else change.id
+
+
+def serialize_changes(changes: list[CodeChange], *, next_id: int, has_more: bool) -> bytes:
+    return orjson.dumps(
+        {
+            "changes": [
+                {**change.model_dump(), "items": rewards_to_json(change.items, change.rewards)}
+                for change in changes
+            ],
+            "next": next_id,
+            "has_more": has_more,
+        }
+    )
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections import defaultdict
+from typing import TYPE_CHECKING, Final
+
+import genshin
+from loguru import logger
+from prisma import get_client
+from prisma.models import RedeemCode
+
+from ..changes import add_code
+from ..config import settings
+from ..logging import traced
+from ..models import CodeJob, CodeJobResult
+from ..snapshot import codes_changed
+from ..utils import account_lock, get_cookies
+from .status_verifier import verify_code_status
+
+if TYPE_CHECKING:
+    from ..models import CreateCode
+
+MAX_JOBS: Final[int] = 100
+
+jobs: dict[str, CodeJob] = {}
+
+
+def create_job(codes: list[CreateCode], *, save: bool) -> CodeJob:
+    unique_codes = list(dict.fromkeys((code.code, code.game) for code in codes))
+    job = CodeJob(
+        id=uuid.uuid4().hex,
+        save=save,
+        results=[CodeJobResult(code=code, game=game) for code, game in unique_codes],
+    )
+
+    # Forget the oldest finished jobs
+    for job_id in [job_id for job_id, old_job in jobs.items() if old_job.finished]:
+        if len(jobs) < MAX_JOBS:
+            break
+        del jobs[job_id]
+
+    jobs[job.id] = job
+    return job
+
+
+async def _mark_existing_codes(results: list[CodeJobResult]) -> None:
+    existing = await RedeemCode.prisma().find_many(
+        where={"OR": [{"code": result.code, "game": result.game} for result in results]}
+    )
+    existing_keys = {(row.code, row.game) for row in existing}
+    for result in results:
+        if (result.code, result.game) in existing_keys:
+            result.state = "exists"
+
+
+async def _verify_with_account(cookies: str, results: list[CodeJobResult], *, save: bool) -> None:
+    """Verify codes one by one with a single account, respecting its redemption rate limit."""
+    for result in results:
+        # Other jobs and the scheduled tasks may be redeeming with the same account
+        async with account_lock(cookies):
+            try:
+                status, redeemed = await verify_code_status(
+                    cookies, result.code, genshin.Game(result.game.value)
+                )
+                if save:
+                    async with get_client().tx() as tx:
+                        await add_code(tx, result.code, result.game, status)
+                    await codes_changed(result.game)
+            except Exception as e:
+                logger.exception(f"Failed to verify code {result.code!r} for {result.game!r}")
+                result.state, result.error = "failed", str(e)
+                continue
+
+            result.state, result.status, result.redeemed = "done", status, redeemed
+            if redeemed:
+                await asyncio.sleep(settings.redeem_interval)
+
+
+@traced
+async def run_job(job: CodeJob) -> None:
+    """Verify the codes of a job, in parallel across accounts."""
+    logger.info(f"Code job {job.id} started with {len(job.results)} codes")
+
+    account_results: defaultdict[str, list[CodeJobResult]] = defaultdict(list)
+    try:
+        if job.save:
+            await _mark_existing_codes(job.results)
+
+        for result in job.results:
+            if result.state != "pending":
+                continue
+
+            cookies = await get_cookies(result.game)
+            if cookies is None:
+                result.state, result.error = "failed", f"No cookies set for {result.game.value!r}"
+                continue
+            account_results[cookies].append(result)
+    except Exception as e:
+        # Finish the job, so it isn't left pending forever and can be forgotten
+        logger.exception(f"Failed to start code job {job.id}")
+        for result in job.results:
+            if result.state == "pending":
+                result.state, result.error = "failed", str(e)
+        return
+
+    await asyncio.gather(
+        *(
+            _verify_with_account(cookies, results, save=job.save)
+            for cookies, results in account_results.items()
+        )
+    )
+    logger.info(f"Code job {job.id} finished")
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Final
+
+from pydantic import BaseModel, Field
+
+from .rewards import normalize_rewards
+from .sources import CodeSource
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+SOURCE_WEIGHTS: Final[dict[CodeSource, float]] = {
+    CodeSource.HOYOLAB: 0.95,  # Official
+    CodeSource.GI_FANDOM: 0.8,
+    CodeSource.HSR_FANDOM: 0.8,
+    CodeSource.ZZZ_FANDOM: 0.8,
+    CodeSource.PRYDWEN: 0.6,
+}
+DEFAULT_SOURCE_WEIGHT: Final[float] = 0.5
+
+
+class CodeCandidate(BaseModel):
+    code: str
+    rewards: str = ""
+    sources: set[CodeSource] = Field(default_factory=set)
+
+    @property
+    def confidence(self) -> float:
+        """Chance that the code is real, assuming each source is independently right."""
+        return 1 - math.prod(
+            1 - SOURCE_WEIGHTS.get(source, DEFAULT_SOURCE_WEIGHT) for source in self.sources
+        )
+
+
+def _rewards_score(rewards: str) -> tuple[int, bool, int]:
+    # Prefer more items, then plain text over wikitext, then more detail
+    return len(normalize_rewards(rewards)), "{{" not in rewards, len(rewards)
+
+
+def merge_codes(results: Mapping[CodeSource, list[tuple[str, str]]]) -> list[CodeCandidate]:
+    """Merge the codes found by every source into candidates, most likely real first.
+
+    Codes reported by several sources are merged into one candidate that keeps the
+    reward text with the most parsable items.
+    """
+    candidates: dict[str, CodeCandidate] = {}
+
+    for source, codes in results.items():
+        for code, rewards in codes:
+            candidate = candidates.setdefault(code, CodeCandidate(code=code))
+            candidate.sources.add(source)
+            if _rewards_score(rewards) > _rewards_score(candidate.rewards):
+                candidate.rewards = rewards
+
+    return sorted(candidates.values(), key=lambda c: c.confidence, reverse=True)
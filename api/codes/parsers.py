@@ -10,18 +10,43 @@ import mwparserfromhell
 from bs4 import BeautifulSoup
 from pydantic import BaseModel
 
+# Everything after the first "/" or ";" is not part of the code
+CODE_CUT_RE = re.compile(r"[/;].*", re.DOTALL)
+BATCH_CODE_CUT_RE = re.compile(r"[/;][^\x1f]*")
+CODE_INDEX_RE = re.compile(r"\[\d+\]")
+BATCH_SEPARATOR = "\x1f"
+
+
+def _remove_noise(text: str) -> str:
+    # One after the other, removing one can reveal another (e.g. "NEQuick RedeemW!")
+    return CODE_INDEX_RE.sub("", text.replace("Quick Redeem", "")).replace("NEW!", "")
+
 
 def sanitize_code(code: str) -> str:
-    if "/" in code:
-        code = code.split("/", maxsplit=1)[0]
-    if ";" in code:
-        code = code.split(";", maxsplit=1)[0]
-    return (
-        re.sub(r"\[\d+\]", "", code.strip().replace("Quick Redeem", ""))
-        .replace("NEW!", "")
-        .upper()
-        .strip()
-    )
+    return _remove_noise(CODE_CUT_RE.sub("", code, count=1)).upper().strip()
+
+
+def sanitize_joined_codes(codes: list[str]) -> str | None:
+    """Sanitize a batch of codes joined by ``BATCH_SEPARATOR``, without stripping them.
+
+    The codes are joined into one string so the regexes and ``upper`` run once for the
+    whole batch instead of once per code.
+
+    Returns:
+        The joined codes, or ``None`` if a code contains the separator.
+    """
+    joined = BATCH_SEPARATOR.join(codes)
+    if joined.count(BATCH_SEPARATOR) != len(codes) - 1:
+        return None
+    return _remove_noise(BATCH_CODE_CUT_RE.sub("", joined)).upper()
+
+
+def sanitize_codes(codes: list[str]) -> list[str]:
+    """Sanitize a batch of codes, equivalent to calling ``sanitize_code`` on each of them."""
+    joined = sanitize_joined_codes(codes)
+    if joined is None:
+        return [sanitize_code(code) for code in codes]
+    return [code.strip() for code in joined.split(BATCH_SEPARATOR)]
 
 
 def parse_gamesradar(content: str) -> list[tuple[str, str]]:
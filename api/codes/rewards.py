@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import functools
+import re
+import sys
+from typing import Any, Final, NamedTuple
+
+NUMBER_WORDS: Final[dict[str, int]] = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+}
+# Commas inside numbers like "10,000" are not separators
+SEPARATOR_RE = re.compile(r"\s*(?:(?<!\d),|,(?!\d{3}(?:\D|$))|[;\n+&]|\band\b)\s*", re.IGNORECASE)
+NOISE_RE = re.compile(r"\((?:new!?|expires?[^)]*)\)|\bnew!", re.IGNORECASE)
+NAME_QUANTITY_RE = re.compile(
+    r"^(?P<name>.+?)(?:\s*[*×]|\s+x)\s*(?P<quantity>\d[\d,]*)$"  # noqa: RUF001
+)
+QUANTITY_NAME_RE = re.compile(
+    r"^(?P<quantity>\d[\d,]*|" + "|".join(NUMBER_WORDS) + r")\s*[x×]?\s+(?P<name>.+)$",  # noqa: RUF001
+    re.IGNORECASE,
+)
+
+
+class Reward(NamedTuple):
+    item: str
+    quantity: int
+
+
+def _parse_quantity(text: str) -> int:
+    return NUMBER_WORDS.get(text.lower()) or int(text.replace(",", ""))
+
+
+def _make_reward(name: str, quantity: int) -> Reward:
+    return Reward(sys.intern(" ".join(name.split()).strip(" .:-")), quantity)
+
+
+def _parse_segment(segment: str) -> Reward | None:
+    segment = segment.strip(" .:-–")  # noqa: RUF001
+    if not segment:
+        return None
+
+    if match := NAME_QUANTITY_RE.match(segment):
+        return _make_reward(match["name"], _parse_quantity(match["quantity"]))
+    if match := QUANTITY_NAME_RE.match(segment):
+        return _make_reward(match["name"], _parse_quantity(match["quantity"]))
+    return _make_reward(segment, 1)
+
+
+def _flatten_wikitext(text: str) -> str:
+    """Turn ``Item List`` and ``Item`` templates into plain ``Name*quantity`` segments."""
+    # Imported here since it is only needed when scraping, not when serving codes
+    import mwparserfromhell  # noqa: PLC0415
+
+    wikicode = mwparserfromhell.parse(text)
+    segments: list[str] = []
+
+    for node in wikicode.filter_templates(recursive=False):
+        if node.name.matches("Item List") and node.has(1):
+            segments.append(str(node.get(1).value).strip())
+        elif node.name.matches("Item") and node.has(1):
+            name = str(node.get(1).value).strip()
+            quantity = str(node.get(2).value).strip() if node.has(2) else "1"
+            segments.append(f"{name}*{quantity}")
+
+    if not segments:
+        return wikicode.strip_code()
+    return ";".join(segments)
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_rewards(text: str) -> tuple[Reward, ...]:
+    """Parse reward text from any source into ``(item, quantity)`` pairs.
+
+    Handles the formats the parsers produce, e.g. ``Stellar Jade x60, Credit x5000``,
+    ``60 Primogems and 5 Hero's Wit``, ``Polychrome*60;Dennies*10000`` and raw
+    ``{{Item List}}`` wikitext. Item names are interned and results are cached, so the
+    same text is only parsed once per process.
+    """
+    if "{{" in text:
+        text = _flatten_wikitext(text)
+    text = NOISE_RE.sub("", text)
+
+    rewards: list[Reward] = []
+    for segment in SEPARATOR_RE.split(text):
+        try:
+            reward = _parse_segment(segment)
+        except ValueError:
+            continue
+        if reward is not None and reward.item:
+            rewards.append(reward)
+    return tuple(rewards)
+
+
+def encode_rewards(rewards: tuple[Reward, ...]) -> str:
+    """Encode rewards into the compact ``Name*quantity;Name*quantity`` form stored in the DB."""
+    return ";".join(f"{reward.item}*{reward.quantity}" for reward in rewards)
+
+
+@functools.lru_cache(maxsize=4096)
+def decode_rewards(items: str) -> tuple[Reward, ...]:
+    rewards: list[Reward] = []
+    for part in items.split(";"):
+        name, _, quantity = part.rpartition("*")
+        if name:
+            rewards.append(Reward(sys.intern(name), int(quantity)))
+    return tuple(rewards)
+
+
+def rewards_to_json(items: str, rewards: str) -> list[dict[str, Any]]:
+    """Get the structured rewards of a code, falling back to its raw reward text."""
+    parsed = decode_rewards(items) if items else normalize_rewards(rewards)
+    return [{"item": reward.item, "quantity": reward.quantity} for reward in parsed]
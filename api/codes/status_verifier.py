@@ -7,16 +7,14 @@ from loguru import logger
 from prisma.enums import CodeStatus, Game
 from prisma.models import RedeemCode
 
+from api.codes.validation import get_code_format
+from api.config import settings
 from api.utils import get_game_uids, set_cookies
 
 
 async def same_family_code_exists(code: str, game: Game) -> bool:
-    if game is not Game.nap or not code.startswith("ZZZ"):
-        return False
-
-    prefix = code[:5]  # ZZZXX
-    # XX needs to be numbers
-    if len(prefix) != 5 or not prefix[3:].isdigit():
+    prefix = get_code_format(genshin.Game(game.value)).get_family(code)
+    if prefix is None:
         return False
 
     existing_codes = await RedeemCode.prisma().find_many(
@@ -44,7 +42,7 @@ async def verify_code_status(  # noqa: PLR0911
             return CodeStatus.NOT_OK, True
         return CodeStatus.OK, True
     except genshin.RedemptionCooldown:
-        await asyncio.sleep(60)
+        await asyncio.sleep(settings.redeem_cooldown_delay)
         return await verify_code_status(cookies, code, game)
     except genshin.RedemptionException:
         return CodeStatus.NOT_OK, True
@@ -1,21 +1,28 @@
 from __future__ import annotations
 
 import asyncio
+from datetime import UTC, datetime
 from typing import Final
 
 import aiohttp
 import genshin
 import orjson
 from loguru import logger
-from prisma import Prisma, enums
+from prisma import Prisma, enums, get_client
 from prisma.errors import ClientAlreadyRegisteredError
 from prisma.models import RedeemCode
 
+from ..changes import add_code, record_change
 from ..codes.status_verifier import verify_code_status
 from ..config import settings
-from ..utils import get_cookies, send_alert
+from ..logging import log_duration, traced
+from ..snapshot import codes_changed
+from ..utils import account_lock, get_cookies, send_alert
 from . import parsers
+from .consensus import CodeCandidate, merge_codes
+from .rewards import encode_rewards, normalize_rewards
 from .sources import CODE_URLS, CodeSource
+from .validation import clean_codes
 
 GPY_GAME_TO_DB_GAME: Final[dict[genshin.Game, enums.Game]] = {
     genshin.Game.GENSHIN: enums.Game.genshin,
@@ -38,82 +45,106 @@ async def fetch_content(session: aiohttp.ClientSession, url: str) -> str:
         return await resp.text()
 
 
-async def save_codes(codes: list[tuple[str, str]], game: genshin.Game) -> None:
+async def save_codes(codes: list[CodeCandidate], game: genshin.Game) -> None:
     enum_game = GPY_GAME_TO_DB_GAME[game]
     cookies = await get_cookies(enum_game)
     if cookies is None:
         logger.warning(f"No cookies found for {enum_game!r}, skipping code verification")
         return
 
-    for code_tuple in codes:
-        code, rewards = code_tuple
+    for candidate in codes:
+        code, rewards = candidate.code, candidate.rewards
+        code_tuple = (code, rewards)
+        items = encode_rewards(normalize_rewards(rewards))
 
         existing_row = await RedeemCode.prisma().find_first(where={"code": code, "game": enum_game})
         if existing_row is not None:
-            if not existing_row.rewards:
+            if not existing_row.rewards and rewards:
+                async with get_client().tx() as tx:
+                    updated_row = await RedeemCode.prisma(tx).update(
+                        where={"id": existing_row.id}, data={"rewards": rewards, "items": items}
+                    )
+                    if updated_row is not None:
+                        await record_change(tx, updated_row, enums.CodeChangeKind.REWARDS_UPDATED)
+                await codes_changed(enum_game)
+                logger.info(f"Updated rewards for code {code_tuple} for {game}")
+            elif existing_row.rewards and not existing_row.items:
                 await RedeemCode.prisma().update(
-                    where={"id": existing_row.id}, data={"rewards": rewards}
+                    where={"id": existing_row.id},
+                    data={"items": encode_rewards(normalize_rewards(existing_row.rewards))},
                 )
-                logger.info(f"Updated rewards for code {code_tuple} for {game}")
             continue
 
-        status, redeemed = await verify_code_status(cookies, code, game)
-
-        await RedeemCode.prisma().create(
-            data={"code": code, "game": enum_game, "status": status, "rewards": rewards}
-        )
-        logger.info(f"Saved code {code_tuple} for {game} with status {status}")
-        if redeemed:
-            await asyncio.sleep(10)
+        async with account_lock(cookies):
+            with log_duration("verify", code=code):
+                status, redeemed = await verify_code_status(cookies, code, game)
+            async with get_client().tx() as tx:
+                await add_code(tx, code, enum_game, status, rewards=rewards, items=items)
+            await codes_changed(enum_game)
+            logger.info(
+                f"Saved code {code_tuple} for {game} with status {status}, "
+                f"confidence {candidate.confidence:.2f} from {', '.join(sorted(candidate.sources))}"
+            )
+            if redeemed:
+                await asyncio.sleep(settings.redeem_interval)
 
 
 async def fetch_codes_task(  # noqa: PLR0912
     session: aiohttp.ClientSession, url: str, source: CodeSource, game: genshin.Game
 ) -> list[tuple[str, str]] | None:
     try:
-        content = await fetch_content(session, url)
+        with log_duration("fetch", source=source.value):
+            content = await fetch_content(session, url)
     except Exception as e:
         logger.error(f"Failed to fetch content from {url}: {e}")
         return None
 
     try:
         codes = None
-        match source:
-            case CodeSource.GAMESRADAR:
-                codes = parsers.parse_gamesradar(content)
-            case CodeSource.POCKETTACTICS:
-                codes = parsers.parse_pockettactics(content)
-            case CodeSource.PRYDWEN:
-                codes = parsers.parse_prydwen(content)
-            case CodeSource.GAMERANT:
-                codes = parsers.parse_gamerant(content)
-            case CodeSource.TRYHARD_GUIDES:
-                codes = parsers.parse_tryhard_guides(content)
-            case CodeSource.HSR_FANDOM:
-                codes = parsers.parse_hsr_fandom(orjson.loads(content))
-            case CodeSource.GI_FANDOM:
-                codes = parsers.parse_gi_fandom(orjson.loads(content))
-            case CodeSource.ZZZ_FANDOM:
-                codes = parsers.parse_zzz_fandom(orjson.loads(content))
-            case CodeSource.HOYOLAB:
-                codes = parsers.parse_hoyolab(orjson.loads(content))
-            case _:
-                logger.error(f"Unknown code source {source!r}")
+        with log_duration("parse", source=source.value):
+            match source:
+                case CodeSource.GAMESRADAR:
+                    codes = parsers.parse_gamesradar(content)
+                case CodeSource.POCKETTACTICS:
+                    codes = parsers.parse_pockettactics(content)
+                case CodeSource.PRYDWEN:
+                    codes = parsers.parse_prydwen(content)
+                case CodeSource.GAMERANT:
+                    codes = parsers.parse_gamerant(content)
+                case CodeSource.TRYHARD_GUIDES:
+                    codes = parsers.parse_tryhard_guides(content)
+                case CodeSource.HSR_FANDOM:
+                    codes = parsers.parse_hsr_fandom(orjson.loads(content))
+                case CodeSource.GI_FANDOM:
+                    codes = parsers.parse_gi_fandom(orjson.loads(content))
+                case CodeSource.ZZZ_FANDOM:
+                    codes = parsers.parse_zzz_fandom(orjson.loads(content))
+                case CodeSource.HOYOLAB:
+                    codes = parsers.parse_hoyolab(orjson.loads(content))
+                case _:
+                    logger.error(f"Unknown code source {source!r}")
 
         if codes is not None:
-            return [(parsers.sanitize_code(code), rewards) for code, rewards in codes]
+            valid_codes: list[tuple[str, str]] = []
+            cleaned = clean_codes([code for code, _ in codes], game)
+            for (code, rewards), clean_code in zip(codes, cleaned, strict=True):
+                if clean_code is None:
+                    logger.info(f"Dropping malformed code {code!r} from {source!r}")
+                    continue
+                valid_codes.append((clean_code, rewards))
+            return valid_codes
     except Exception:
         logger.exception(f"Failed to parse codes from {source!r} for {game!r}")
         return None
 
 
-async def fetch_codes() -> dict[genshin.Game, list[tuple[str, str]]]:
-    result: dict[genshin.Game, list[tuple[str, str]]] = {}
+async def fetch_codes() -> dict[genshin.Game, list[CodeCandidate]]:
+    result: dict[genshin.Game, list[CodeCandidate]] = {}
     headers = {"User-Agent": USER_AGENT}
 
     async with aiohttp.ClientSession(headers=headers, proxy=settings.proxy_url) as session:
         for game, code_sources in CODE_URLS.items():
-            game_codes: list[tuple[str, str]] = []
+            source_codes: dict[CodeSource, list[tuple[str, str]]] = {}
 
             for source, url in code_sources.items():
                 codes = await fetch_codes_task(session, url, source, game)
@@ -131,14 +162,14 @@ async def fetch_codes() -> dict[genshin.Game, list[tuple[str, str]]]:
                     await send_alert(msg)
                     continue
 
-                game_codes.extend(codes)
+                source_codes[source] = codes
 
-            game_codes = list(set(game_codes))
-            result[game] = game_codes
+            result[game] = merge_codes(source_codes)
 
     return result
 
 
+@traced
 async def update_codes() -> None:
     logger.info("Update codes task started")
 
@@ -161,6 +192,29 @@ async def update_codes() -> None:
     logger.info("Done")
 
 
+async def update_code_status(code: RedeemCode, status: enums.CodeStatus) -> None:
+    """Save the result of checking a code, logging its new status if it changed."""
+    now = datetime.now(UTC)
+    if status == code.status:
+        await RedeemCode.prisma().update(where={"id": code.id}, data={"verified_at": now})
+        return
+
+    async with get_client().tx() as tx:
+        updated_code = await RedeemCode.prisma(tx).update(
+            where={"id": code.id},
+            data={
+                "status": status,
+                "verified_at": now,
+                "expired_at": now if status is enums.CodeStatus.NOT_OK else None,
+            },
+        )
+        if updated_code is not None:
+            await record_change(tx, updated_code, enums.CodeChangeKind.STATUS_CHANGED)
+    await codes_changed(code.game)
+    logger.info(f"Updated status of code {code.code} to {status}")
+
+
+@traced
 async def check_codes() -> None:
     logger.info("Check codes task started")
 
@@ -183,15 +237,14 @@ async def check_codes() -> None:
 
             logger.info(f"Checking status of code {code.code!r}, game {code.game!r}")
 
-            status, redeemed = await verify_code_status(
-                cookies, code.code, DB_GAME_TO_GPY_GAME[code.game]
-            )
-            if status != code.status:
-                await RedeemCode.prisma().update(where={"id": code.id}, data={"status": status})
-                logger.info(f"Updated status of code {code.code} to {status}")
-
-            if redeemed:
-                await asyncio.sleep(10)
+            async with account_lock(cookies):
+                with log_duration("verify", code=code.code):
+                    status, redeemed = await verify_code_status(
+                        cookies, code.code, DB_GAME_TO_GPY_GAME[code.game]
+                    )
+                await update_code_status(code, status)
+                if redeemed:
+                    await asyncio.sleep(settings.redeem_interval)
     finally:
         if db is not None:
             await db.disconnect()
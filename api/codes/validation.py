@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import re
+from typing import Final
+
+from genshin import Game
+
+from .parsers import BATCH_SEPARATOR, sanitize_code, sanitize_joined_codes
+
+
+class CodeFormat:
+    """What a valid redeem code of a game looks like.
+
+    Args:
+        charset: Characters allowed in a code, as a regex character class body.
+        min_length: Minimum length of a code.
+        max_length: Maximum length of a code.
+        family_prefix: Regex matching the prefix shared by codes of the same family, only
+            one code of a family can be redeemed per account.
+    """
+
+    def __init__(
+        self,
+        *,
+        charset: str = "A-Z0-9",
+        min_length: int = 5,
+        max_length: int = 20,
+        family_prefix: str | None = None,
+    ) -> None:
+        code = rf"[{charset}]{{{min_length},{max_length}}}"
+        self.pattern = re.compile(code)
+        # Matches each code of a sanitized batch, with the surrounding whitespace that
+        # sanitizing strips, capturing it only if it is valid
+        sep = re.escape(BATCH_SEPARATOR)
+        self.batch_pattern = re.compile(
+            rf"(?:^|{sep})[^\S{sep}]*(?:(?P<code>{code})[^\S{sep}]*(?={sep}|\Z)|[^{sep}]*)"
+        )
+        self.family_prefix = None if family_prefix is None else re.compile(family_prefix)
+
+    def is_valid(self, code: str) -> bool:
+        return self.pattern.fullmatch(code) is not None
+
+    def get_family(self, code: str) -> str | None:
+        if self.family_prefix is None or (match := self.family_prefix.match(code)) is None:
+            return None
+        return match[0]
+
+
+DEFAULT_CODE_FORMAT: Final[CodeFormat] = CodeFormat()
+CODE_FORMATS: Final[dict[Game, CodeFormat]] = {Game.ZZZ: CodeFormat(family_prefix=r"ZZZ\d{2}")}
+
+
+def get_code_format(game: Game) -> CodeFormat:
+    return CODE_FORMATS.get(game, DEFAULT_CODE_FORMAT)
+
+
+def clean_codes(codes: list[str], game: Game) -> list[str | None]:
+    """Sanitize and validate a batch of scraped codes.
+
+    Returns:
+        The sanitized codes, with ``None`` in place of the ones that are not valid for the game.
+    """
+    code_format = get_code_format(game)
+    joined = sanitize_joined_codes(codes)
+    if joined is None:
+        sanitized = (sanitize_code(code) for code in codes)
+        return [code if code_format.is_valid(code) else None for code in sanitized]
+    return [code or None for code in code_format.batch_pattern.findall(joined)]
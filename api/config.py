@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
@@ -10,6 +12,22 @@ class Settings(BaseSettings):
     port: int = 1078
     api_token: str | None = None
     discord_webhook_url: str | None = None
+    redeem_interval: float = 10
+    redeem_cooldown_delay: float = 60
+    log_json: bool = False
+    log_enqueue: bool = False
+    access_log_sample_rate: float = 1.0
+    cache_backend: Literal["memory", "sqlite"] = "memory"
+    cache_path: str = "cache.sqlite3"
+    codes_cache_ttl: float = 60
+    fast_startup: bool = False
+    ready_timeout: float = 5
+    snapshot_enabled: bool = False
+    snapshot_interval: float = 60
+    snapshot_path: str | None = None
+    rate_limit_requests: int = 0
+    rate_limit_window: float = 60
+    coalesce_requests: bool = True
 
 
 load_dotenv()
@@ -1,11 +1,29 @@
 from __future__ import annotations
 
-import inspect
+import functools
 import logging
+import random
 import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
 from loguru import logger
 
+from .config import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Generator
+
+    from loguru import Record
+
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<magenta>{extra[trace_id]}</magenta> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
 
 class InterceptHandler(logging.Handler):
     def emit(self, record: logging.LogRecord) -> None:
@@ -15,25 +33,77 @@ class InterceptHandler(logging.Handler):
         except ValueError:
             level = record.levelno
 
-        # Find caller from where originated the logged message.
-        frame, depth = inspect.currentframe(), 0
-        while frame:
-            filename = frame.f_code.co_filename
-            is_logging = filename == logging.__file__
-            is_frozen = "importlib" in filename and "_bootstrap" in filename
-            if depth > 0 and not (is_logging or is_frozen):
-                break
-            frame = frame.f_back
-            depth += 1
+        # The stdlib record already knows where it was logged from, so use that instead
+        # of walking the stack to find the caller.
+        def patch(r: Record) -> None:
+            r.update(
+                name=record.name, module=record.module, function=record.funcName, line=record.lineno
+            )
+            r["file"].name, r["file"].path = record.filename, record.pathname
+
+        logger.patch(patch).opt(exception=record.exc_info).log(level, record.getMessage())
+
+
+class AccessLogSampler(logging.Filter):
+    """Only let a fraction of the uvicorn access logs through."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: ARG002
+        return random.random() < self.rate
+
 
-        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def traced[**P, R](func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    """Bind a new trace ID to every log emitted while the decorated coroutine runs."""
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with logger.contextualize(trace_id=new_trace_id()):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def log_duration(stage: str, **extra: object) -> Generator[None]:
+    """Log how long the wrapped block took, tagged with the stage name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        # Skip this generator and contextlib's __exit__, to point at the wrapped block
+        logger.opt(depth=2).bind(stage=stage, duration_ms=elapsed, **extra).debug(
+            f"{stage} took {elapsed:.1f}ms"
+        )
 
 
 def setup_logging() -> None:
     logger.remove()
-    logger.add(sys.stdout, level="INFO", backtrace=True, diagnose=False)
+    logger.configure(extra={"trace_id": "-"})
+    logger.add(
+        sys.stdout,
+        level="INFO",
+        format=LOG_FORMAT,
+        backtrace=True,
+        diagnose=False,
+        enqueue=settings.log_enqueue,
+        serialize=settings.log_json,
+    )
     logger.add(
-        "logs/log_{time:YYYY-MM-DD}.log", rotation="00:00", retention="7 days", level="DEBUG"
+        "logs/log_{time:YYYY-MM-DD}.log",
+        rotation="00:00",
+        retention="7 days",
+        level="DEBUG",
+        format=LOG_FORMAT,
+        enqueue=settings.log_enqueue,
+        serialize=settings.log_json,
     )
 
     logger.disable("httpx")
@@ -45,3 +115,10 @@ def setup_logging() -> None:
         logger_ = logging.getLogger(name)
         logger_.handlers = [InterceptHandler()]
         logger_.propagate = False
+
+    access_logger = logging.getLogger("uvicorn.access")
+    access_logger.filters.clear()
+    if settings.access_log_sample_rate <= 0:
+        access_logger.disabled = True
+    elif settings.access_log_sample_rate < 1:
+        access_logger.addFilter(AccessLogSampler(settings.access_log_sample_rate))
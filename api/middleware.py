@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import TYPE_CHECKING, Final
+
+from fastapi.responses import JSONResponse
+from loguru import logger
+
+from .config import settings
+
+if TYPE_CHECKING:
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+RATE_LIMIT_EXEMPT_PATHS: Final[frozenset[str]] = frozenset({"/health", "/ready"})
+COALESCED_PATHS: Final[frozenset[str]] = frozenset({"/codes"})
+MAX_TRACKED_CLIENTS: Final[int] = 10000
+
+
+def _get_header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class RateLimitMiddleware:
+    """Limit how many requests each client can make with a token bucket.
+
+    Requests with the API token share one bucket, every other client is told apart by its IP.
+    Requests over the limit are answered with 429 and a ``Retry-After`` header.
+    """
+
+    def __init__(self, app: ASGIApp, *, requests: int, window: float) -> None:
+        self.app = app
+        self.capacity = requests
+        self.refill_rate = requests / window
+        # Client key -> (tokens left, time of the last update)
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def _client_key(self, scope: Scope) -> str:
+        # Any other token would let a client get a new bucket for every request
+        scheme, _, token = (_get_header(scope, b"authorization") or "").partition(" ")
+        if (
+            settings.api_token is not None
+            and scheme.lower() == "bearer"
+            and token == settings.api_token
+        ):
+            return "token:api"
+
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    def _prune(self, now: float) -> None:
+        """Forget clients whose bucket has filled up again, they are the same as new ones."""
+        full_after = self.capacity / self.refill_rate
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < full_after
+        }
+
+    def _acquire(self, key: str) -> float:
+        """Take a token from the client's bucket.
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_rate)
+
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.refill_rate
+
+        if key not in self._buckets and len(self._buckets) >= MAX_TRACKED_CLIENTS:
+            self._prune(now)
+        self._buckets[key] = (tokens - 1, now)
+        return 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in RATE_LIMIT_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._client_key(scope)
+        retry_after = self._acquire(key)
+        if retry_after > 0:
+            logger.debug(f"Rate limited {key} on {scope['path']}")
+            response = JSONResponse(
+                content={"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+class CoalesceMiddleware:
+    """Let concurrent identical GET requests share the response of the first one.
+
+    Only requests to ``COALESCED_PATHS`` are coalesced, the query string is part of the key.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._in_flight: dict[tuple[str, bytes], asyncio.Task[list[Message]]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or scope["path"] not in COALESCED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], scope["query_string"])
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(scope, receive))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._fetch_done(key, t))
+
+        # Shielded so a client disconnecting doesn't cancel the response for the others
+        messages = await asyncio.shield(task)
+        for message in messages:
+            await send(message)
+
+    async def _fetch(self, scope: Scope, receive: Receive) -> list[Message]:
+        messages: list[Message] = []
+
+        async def buffer(message: Message) -> None:  # noqa: RUF029
+            messages.append(message)
+
+        await self.app(scope, receive, buffer)
+        return messages
+
+    def _fetch_done(self, key: tuple[str, bytes], task: asyncio.Task[list[Message]]) -> None:
+        del self._in_flight[key]
+        if not task.cancelled():
+            # Retrieve the exception in case every request waiting for it is gone
+            task.exception()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from prisma.enums import Game
-from pydantic import BaseModel, field_validator
+from typing import Literal
+
+from prisma.enums import CodeStatus, Game
+from pydantic import BaseModel, Field, field_validator
 
 
 class CreateCode(BaseModel):
@@ -12,3 +14,26 @@ class CreateCode(BaseModel):
     @classmethod
     def __upper_code(cls, v: str) -> str:
         return v.upper()
+
+
+class BatchCodes(BaseModel):
+    codes: list[CreateCode] = Field(min_length=1, max_length=100)
+
+
+class CodeJobResult(BaseModel):
+    code: str
+    game: Game
+    state: Literal["pending", "exists", "done", "failed"] = "pending"
+    status: CodeStatus | None = None
+    redeemed: bool | None = None
+    error: str | None = None
+
+
+class CodeJob(BaseModel):
+    id: str
+    save: bool
+    results: list[CodeJobResult]
+
+    @property
+    def finished(self) -> bool:
+        return all(result.state != "pending" for result in self.results)
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+from collections import defaultdict
+from types import MappingProxyType
+from typing import TYPE_CHECKING, NamedTuple
+
+import aiofiles
+import orjson
+from loguru import logger
+from prisma.enums import CodeStatus, Game
+from prisma.models import RedeemCode
+
+from .cache import cache, codes_generation_name
+from .codes.rewards import rewards_to_json
+from .config import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+
+class CodesSnapshot(NamedTuple):
+    """Serialized ``/codes`` response bodies of every game, built at ``created_at``."""
+
+    created_at: float
+    responses: Mapping[str, bytes]
+
+    @property
+    def age(self) -> float:
+        return max(time.time() - self.created_at, 0)
+
+
+_snapshot: CodesSnapshot | None = None
+_refresh_lock = asyncio.Lock()
+_pending_refresh: asyncio.Task[None] | None = None
+# Responses of the snapshot in the file, to only rewrite it when they change
+_saved_responses: Mapping[str, bytes] | None = None
+
+
+def serialize_codes(codes: list[RedeemCode], game: Game) -> bytes:
+    return orjson.dumps(
+        {
+            "codes": [
+                {**code.model_dump(), "items": rewards_to_json(code.items, code.rewards)}
+                for code in codes
+            ],
+            "game": game.value,
+        }
+    )
+
+
+def get_snapshot() -> CodesSnapshot | None:
+    return _snapshot
+
+
+def _write_file(path: str, content: bytes) -> None:
+    # Every worker saves the snapshot, so each one needs its own temporary file
+    directory, name = os.path.split(os.path.abspath(path))  # noqa: PTH100
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)  # noqa: PTH105
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)  # noqa: PTH107
+        raise
+
+
+async def _save_snapshot(snapshot: CodesSnapshot, path: str) -> None:
+    data = {
+        "created_at": snapshot.created_at,
+        "responses": {game: body.decode() for game, body in snapshot.responses.items()},
+    }
+    await asyncio.to_thread(_write_file, path, orjson.dumps(data))
+
+
+async def load_snapshot() -> None:
+    """Load the snapshot persisted by a previous run, so codes can be served right away."""
+    global _snapshot, _saved_responses  # noqa: PLW0603
+
+    if settings.snapshot_path is None:
+        return
+
+    try:
+        async with aiofiles.open(settings.snapshot_path, "rb") as f:
+            data = orjson.loads(await f.read())
+    except FileNotFoundError:
+        return
+    except orjson.JSONDecodeError:
+        logger.warning(f"Ignoring corrupted codes snapshot at {settings.snapshot_path}")
+        return
+
+    try:
+        responses = {game: body.encode() for game, body in data["responses"].items()}
+        _snapshot = CodesSnapshot(float(data["created_at"]), MappingProxyType(responses))
+        _saved_responses = _snapshot.responses
+    except (KeyError, TypeError, AttributeError, ValueError):
+        logger.warning(f"Ignoring corrupted codes snapshot at {settings.snapshot_path}")
+        return
+    logger.info(f"Loaded codes snapshot from {settings.snapshot_path}, {_snapshot.age:.0f}s old")
+
+
+async def refresh_snapshot() -> None:
+    """Rebuild the snapshot from the database and swap it in.
+
+    If the database can't be reached, the previous snapshot is kept.
+    """
+    global _snapshot, _saved_responses  # noqa: PLW0603
+
+    async with _refresh_lock:
+        try:
+            created_at = time.time()
+            codes = await RedeemCode.prisma().find_many(where={"status": CodeStatus.OK})
+        except Exception:
+            logger.exception("Failed to refresh codes snapshot, keeping the previous one")
+            return
+
+        game_codes: defaultdict[Game, list[RedeemCode]] = defaultdict(list)
+        for code in codes:
+            game_codes[code.game].append(code)
+
+        responses = {game.value: serialize_codes(game_codes[game], game) for game in Game}
+        _snapshot = CodesSnapshot(created_at, MappingProxyType(responses))
+
+        if settings.snapshot_path is not None and responses != _saved_responses:
+            try:
+                await _save_snapshot(_snapshot, settings.snapshot_path)
+            except OSError:
+                logger.exception(f"Failed to save codes snapshot to {settings.snapshot_path}")
+            else:
+                _saved_responses = _snapshot.responses
+
+
+async def _refresh_soon() -> None:
+    global _pending_refresh  # noqa: PLW0603
+
+    # Let writes that happen in quick succession share one rebuild
+    await asyncio.sleep(1)
+    _pending_refresh = None
+    await refresh_snapshot()
+
+
+async def codes_changed(game: Game) -> None:
+    """Invalidate everything serving the codes of a game after they were written to."""
+    global _pending_refresh  # noqa: PLW0603
+
+    await cache.bump_generation(codes_generation_name(game.value))
+    if settings.snapshot_enabled and _pending_refresh is None:
+        _pending_refresh = asyncio.create_task(_refresh_soon())
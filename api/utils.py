@@ -1,11 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import io
 import tomllib
+from collections import defaultdict
 from typing import TYPE_CHECKING
 
 import aiofiles
-import aiohttp
 import orjson
 
 from api.config import settings
@@ -13,6 +14,8 @@ from api.config import settings
 if TYPE_CHECKING:
     from prisma.enums import Game
 
+_account_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
 
 async def get_cookies(game: Game) -> str | None:
     try:
@@ -24,6 +27,11 @@ async def get_cookies(game: Game) -> str | None:
     return data.get(str(game))
 
 
+def account_lock(cookies: str) -> asyncio.Lock:
+    """Lock to hold while redeeming codes with an account, so they are redeemed one at a time."""
+    return _account_locks[cookies]
+
+
 async def set_cookies(game: Game, cookies: str) -> None:
     async with aiofiles.open("cookies.json", "w", encoding="utf-8") as f:
         try:
@@ -61,6 +69,8 @@ async def send_alert(message: str) -> bool:
     if settings.discord_webhook_url is None:
         return False
 
+    import aiohttp  # noqa: PLC0415
+
     async with (
         aiohttp.ClientSession() as session,
         session.post(
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any
+
+import genshin
+
+
+class FakeRedeemer:
+    """Stand-in for ``genshin.Client.redeem_code`` that never talks to HoYoLAB.
+
+    The outcome of a code is derived from the code itself, so repeated runs redeem the
+    same codes the same way. Redemptions made less than ``cooldown`` seconds apart on the
+    same UID are rejected with ``genshin.RedemptionCooldown``, like HoYoLAB does.
+
+    Args:
+        latency: Seconds every redemption takes.
+        valid_rate: Fraction of codes that redeem successfully.
+        claimed_rate: Fraction of codes that were already claimed.
+        cooldown: Minimum number of seconds between two redemptions on the same UID.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.05,
+        valid_rate: float = 0.6,
+        claimed_rate: float = 0.2,
+        cooldown: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.valid_rate = valid_rate
+        self.claimed_rate = claimed_rate
+        self.cooldown = cooldown
+
+        self.calls = 0
+        self.cooldowns = 0
+        self._last_redeem: dict[int | None, float] = {}
+        self._original: Any = None
+
+    def _raise_for_outcome(self, code: str) -> None:
+        roll = random.Random(code).random()
+        if roll < self.valid_rate:
+            return
+        if roll < self.valid_rate + self.claimed_rate:
+            genshin.raise_for_retcode({"retcode": -2017, "message": "Code already claimed"})
+        genshin.raise_for_retcode({"retcode": -2001, "message": "Code has expired"})
+
+    async def redeem_code(self, code: str, uid: int | None = None) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        last = self._last_redeem.get(uid)
+        if last is not None and now - last < self.cooldown:
+            self.cooldowns += 1
+            genshin.raise_for_retcode({"retcode": -2016, "message": "Redemption in cooldown"})
+        self._last_redeem[uid] = now
+
+        self._raise_for_outcome(code)
+
+    def install(self) -> None:
+        """Patch ``genshin.Client.redeem_code`` to use this redeemer."""
+        redeemer = self
+
+        async def redeem_code(
+            _: genshin.Client, code: str, uid: int | None = None, **__: Any
+        ) -> None:
+            await redeemer.redeem_code(code, uid)
+
+        self._original = genshin.Client.redeem_code
+        genshin.Client.redeem_code = redeem_code
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            genshin.Client.redeem_code = self._original
+            self._original = None
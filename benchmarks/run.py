@@ -0,0 +1,294 @@
+"""Benchmark the read API and the update/check pipeline against local stand-ins.
+
+Code sources are served by a local HTTP stub and HoYoLAB redemptions are answered by a
+fake redeemer, so nothing leaves the machine except the database connection. Point
+``DATABASE_URL`` to a disposable PostgreSQL database with the schema pushed
+(``prisma db push``), then run ``python -m benchmarks.run --help``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import os
+import socket
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from itertools import cycle
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+import orjson
+from loguru import logger
+
+from .fake_hoyolab import FakeRedeemer
+from .stub_server import CODE_PREFIX, SourceStub
+
+ROOT = Path(__file__).parent.parent
+READ_GAMES = ("genshin", "hkrpg", "nap")
+
+
+def find_free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def write_account_files(workdir: Path) -> None:
+    """Write the ``cookies.json`` and ``uids.json`` files the pipeline reads."""
+    games = ("genshin", "hkrpg", "nap")
+    cookies = dict.fromkeys(games, "ltuid_v2=1; ltoken_v2=benchmark")
+    uids = {game: 100000000 + i for i, game in enumerate(games)}
+    (workdir / "cookies.json").write_bytes(orjson.dumps(cookies))
+    (workdir / "uids.json").write_bytes(orjson.dumps(uids))
+
+
+async def delete_benchmark_codes() -> int:
+    from prisma.models import CodeChange, RedeemCode  # noqa: PLC0415
+
+    await CodeChange.prisma().delete_many(where={"code": {"startswith": CODE_PREFIX}})
+    return await RedeemCode.prisma().delete_many(where={"code": {"startswith": CODE_PREFIX}})
+
+
+async def count_benchmark_codes() -> int:
+    from prisma.models import RedeemCode  # noqa: PLC0415
+
+    return await RedeemCode.prisma().count(where={"code": {"startswith": CODE_PREFIX}})
+
+
+async def time_it(name: str, coro: Any) -> float:
+    logger.info(f"Running {name}")
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    logger.info(f"{name} took {elapsed:.2f}s")
+    return elapsed
+
+
+async def run_pipeline(args: argparse.Namespace, workdir: Path) -> dict[str, Any]:
+    from api.codes.task import check_codes, update_codes  # noqa: PLC0415
+    from api.config import settings  # noqa: PLC0415
+
+    settings.discord_webhook_url = None
+    settings.proxy_url = None
+    settings.redeem_interval = args.redeem_interval
+    settings.redeem_cooldown_delay = args.cooldown_delay
+
+    stub = SourceStub(
+        code_count=args.codes,
+        latency=args.source_latency,
+        jitter=args.source_jitter,
+        error_rate=args.source_error_rate,
+        pages_dir=args.pages_dir,
+    )
+    redeemer = FakeRedeemer(
+        latency=args.redeem_latency,
+        valid_rate=args.valid_rate,
+        claimed_rate=args.claimed_rate,
+        cooldown=args.redeem_cooldown,
+    )
+
+    write_account_files(workdir)
+    await stub.start(args.host, find_free_port(args.host))
+    stub.patch_code_urls()
+    redeemer.install()
+
+    try:
+        await delete_benchmark_codes()
+        cold_update = await time_it("update_codes (cold)", update_codes())
+        saved = await count_benchmark_codes()
+        cold_calls = redeemer.calls
+        warm_update = await time_it("update_codes (warm)", update_codes())
+        check = await time_it("check_codes", check_codes())
+    finally:
+        redeemer.uninstall()
+        await stub.stop()
+
+    return {
+        "update_cold_s": cold_update,
+        "update_warm_s": warm_update,
+        "check_s": check,
+        "codes_saved": saved,
+        "redeem_calls_cold": cold_calls,
+        "redeem_calls": redeemer.calls,
+        "redeem_cooldowns": redeemer.cooldowns,
+        "source_requests": stub.requests,
+        "source_errors": stub.errors,
+    }
+
+
+async def wait_until_ready(
+    session: aiohttp.ClientSession, base_url: str, path: str = "/health"
+) -> None:
+    while True:
+        try:
+            async with session.get(f"{base_url}{path}") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+
+
+async def run_load(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    latencies: list[float] = []
+    failures = 0
+    urls = cycle(f"{base_url}/codes?game={game}" for game in READ_GAMES)
+    remaining = args.requests
+
+    async def worker(session: aiohttp.ClientSession) -> None:
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            url = next(urls)
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        failures += 1
+            except aiohttp.ClientError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with asyncio.timeout(args.startup_timeout):
+            await wait_until_ready(session, base_url)
+        for game in READ_GAMES:  # Warm up
+            async with session.get(f"{base_url}/codes?game={game}") as resp:
+                await resp.read()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "failures": failures,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def start_server(args: argparse.Namespace, workdir: Path, port: int) -> subprocess.Popen[bytes]:
+    env = {**os.environ, "HOST": args.host, "PORT": str(port), "PYTHONPATH": str(ROOT)}
+    return subprocess.Popen(  # noqa: S603
+        [sys.executable, str(ROOT / "run.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if not os.environ.get("DATABASE_URL"):
+        msg = "DATABASE_URL is not set, pass --database-url or set the environment variable"
+        raise SystemExit(msg)
+
+    from prisma import Prisma  # noqa: PLC0415
+
+    cwd = Path.cwd()
+    db = Prisma(auto_register=True)
+    await db.connect()
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="hoyo-codes-bench-") as tmp:
+            workdir = Path(tmp)
+            os.chdir(workdir)
+            results: dict[str, Any] = {"pipeline": await run_pipeline(args, workdir)}
+
+            port = find_free_port(args.host)
+            server = start_server(args, workdir, port)
+            try:
+                results["read"] = await run_load(args, f"http://{args.host}:{port}")
+            finally:
+                server.terminate()
+                server.wait()
+                os.chdir(cwd)
+
+        if not args.keep:
+            await delete_benchmark_codes()
+    finally:
+        await db.disconnect()
+
+    return results
+
+
+def format_report(results: dict[str, Any]) -> str:
+    pipeline, read = results["pipeline"], results["read"]
+    return "\n".join(
+        (
+            "GET /codes",
+            f"  requests   {read['requests']} ({read['failures']} failed)",
+            f"  rps        {read['rps']:.1f}",
+            f"  p50        {read['p50_ms']:.2f} ms",
+            f"  p99        {read['p99_ms']:.2f} ms",
+            "Pipeline",
+            f"  update (cold)  {pipeline['update_cold_s']:.2f} s, {pipeline['codes_saved']} codes saved",
+            f"  update (warm)  {pipeline['update_warm_s']:.2f} s",
+            f"  check          {pipeline['check_s']:.2f} s",
+            f"  redeem calls   {pipeline['redeem_calls']} ({pipeline['redeem_cooldowns']} cooldowns)",
+            f"  source fetches {pipeline['source_requests']} ({pipeline['source_errors']} injected errors)",
+        )
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__)
+    parser.add_argument("--database-url", help="Defaults to the DATABASE_URL env variable")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--output", type=Path, help="Also write the results as JSON here")
+    parser.add_argument("--keep", action="store_true", help="Keep benchmark codes afterwards")
+
+    sources = parser.add_argument_group("sources")
+    sources.add_argument("--codes", type=int, default=50, help="Synthetic codes per game")
+    sources.add_argument("--pages-dir", type=Path, help="Directory of recorded pages")
+    sources.add_argument("--source-latency", type=float, default=0.05)
+    sources.add_argument("--source-jitter", type=float, default=0.05)
+    sources.add_argument("--source-error-rate", type=float, default=0.0)
+
+    redeem = parser.add_argument_group("redemption")
+    redeem.add_argument("--redeem-latency", type=float, default=0.05)
+    redeem.add_argument("--valid-rate", type=float, default=0.6)
+    redeem.add_argument("--claimed-rate", type=float, default=0.2)
+    redeem.add_argument(
+        "--redeem-cooldown", type=float, default=0.1, help="Min seconds between redemptions"
+    )
+    redeem.add_argument("--redeem-interval", type=float, default=0.05)
+    redeem.add_argument("--cooldown-delay", type=float, default=0.1)
+
+    load = parser.add_argument_group("read load")
+    load.add_argument("--requests", type=int, default=5000)
+    load.add_argument("--concurrency", type=int, default=50)
+    load.add_argument("--startup-timeout", type=float, default=30)
+
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    results = asyncio.run(benchmark(args))
+    sys.stdout.write(format_report(results) + "\n")
+    if args.output is not None:
+        args.output.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Check that the batch code sanitizer and validator match the original sanitizer, and time them.
+
+Run with ``python -m benchmarks.sanitize``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import string
+import sys
+import timeit
+
+from genshin import Game
+
+from api.codes.parsers import sanitize_code, sanitize_codes
+from api.codes.validation import clean_codes, get_code_format
+
+NOISE = (
+    "{code}",
+    " {code} ",
+    "{code}[1]",
+    "{code} [12]",
+    "NEW! {code}",
+    "{code} NEW!",
+    "{code} Quick Redeem",
+    "Quick Redeem{code}",
+    "{code}/{other}",
+    "{code} / {other}",
+    "{code};{other}",
+    "{code}; expires soon",
+    "{lower}",
+    "{lower} [3] new!",
+    "\n{code}\t",
+    "{code} - 60 Primogems",
+    "Redeem code {code} here",
+    "NEQuick RedeemW!{code}",
+    "[1Quick Redeem]{code}",
+    "[NEW!3]{code}",
+    "",
+)
+
+
+def legacy_sanitize_code(code: str) -> str:
+    """``sanitize_code`` as it was before it was precompiled."""
+    if "/" in code:
+        code = code.split("/", maxsplit=1)[0]
+    if ";" in code:
+        code = code.split(";", maxsplit=1)[0]
+    return (
+        re.sub(r"\[\d+\]", "", code.strip().replace("Quick Redeem", ""))
+        .replace("NEW!", "")
+        .upper()
+        .strip()
+    )
+
+
+def build_corpus(size: int) -> list[str]:
+    rng = random.Random(0)
+    alphabet = string.ascii_uppercase + string.digits
+    corpus: list[str] = []
+    for _ in range(size):
+        code = "".join(rng.choices(alphabet, k=rng.randint(8, 14)))
+        other = "".join(rng.choices(alphabet, k=12))
+        template = rng.choice(NOISE)
+        corpus.append(template.format(code=code, other=other, lower=code.lower()))
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.sanitize", description=__doc__)
+    parser.add_argument("--size", type=int, default=200, help="Codes per batch")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.size)
+    expected = [legacy_sanitize_code(code) for code in corpus]
+    if [sanitize_code(code) for code in corpus] != expected or sanitize_codes(corpus) != expected:
+        sys.exit("Sanitized codes differ from the original implementation")
+    code_format = get_code_format(Game.GENSHIN)
+    if clean_codes(corpus, Game.GENSHIN) != [
+        code if code_format.is_valid(code) else None for code in expected
+    ]:
+        sys.exit("Cleaned codes differ from validating the original sanitized codes")
+
+    timings = {
+        "legacy sanitize_code": timeit.timeit(
+            lambda: [legacy_sanitize_code(code) for code in corpus], number=args.repeat
+        ),
+        "sanitize_code": timeit.timeit(
+            lambda: [sanitize_code(code) for code in corpus], number=args.repeat
+        ),
+        "sanitize_codes": timeit.timeit(lambda: sanitize_codes(corpus), number=args.repeat),
+        "legacy + is_valid": timeit.timeit(
+            lambda: [
+                code if code_format.is_valid(code) else None
+                for code in (legacy_sanitize_code(code) for code in corpus)
+            ],
+            number=args.repeat,
+        ),
+        "clean_codes": timeit.timeit(lambda: clean_codes(corpus, Game.GENSHIN), number=args.repeat),
+    }
+
+    baseline = timings["legacy sanitize_code"]
+    per_code = args.size * args.repeat
+    for name, elapsed in timings.items():
+        sys.stdout.write(
+            f"{name:<22} {elapsed / per_code * 1e9:8.1f} ns/code  {baseline / elapsed:5.2f}x\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
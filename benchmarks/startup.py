@@ -0,0 +1,99 @@
+"""Measure how long the app takes to import and to answer its first requests.
+
+Run with ``python -m benchmarks.startup``. ``DATABASE_URL`` must point to a reachable
+database for the app to become ready.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+from .run import ROOT, find_free_port, wait_until_ready
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import api.app; print(time.perf_counter() - start)"
+)
+
+
+def measure_import(workdir: Path) -> float:
+    output = subprocess.check_output(  # noqa: S603
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=workdir,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def spawn_server(workdir: Path, host: str, port: int, *, fast: bool) -> subprocess.Popen[bytes]:
+    env = {
+        **os.environ,
+        "HOST": host,
+        "PORT": str(port),
+        "PYTHONPATH": str(ROOT),
+        "FAST_STARTUP": str(fast).lower(),
+    }
+    return subprocess.Popen(  # noqa: S603
+        [sys.executable, str(ROOT / "run.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def measure_start(workdir: Path, host: str, *, fast: bool) -> dict[str, float]:
+    port = find_free_port(host)
+    base_url = f"http://{host}:{port}"
+
+    start = time.perf_counter()
+    server = spawn_server(workdir, host, port, fast=fast)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_until_ready(session, base_url, "/health")
+            live = time.perf_counter() - start
+            await wait_until_ready(session, base_url, "/ready")
+            ready = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {"live": live, "ready": ready}
+
+
+async def benchmark(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory(prefix="hoyo-codes-startup-") as tmp:
+        workdir = Path(tmp)
+        imports = [measure_import(workdir) for _ in range(args.runs)]
+        sys.stdout.write(f"import api.app         {statistics.median(imports) * 1000:8.1f} ms\n")
+
+        for fast in (False, True):
+            runs: list[dict[str, float]] = []
+            for _ in range(args.runs):
+                async with asyncio.timeout(args.timeout):
+                    runs.append(await measure_start(workdir, args.host, fast=fast))
+            mode = "fast" if fast else "default"
+            for stage in ("live", "ready"):
+                median = statistics.median(run[stage] for run in runs)
+                sys.stdout.write(f"{mode:<7} first /{stage:<6}   {median * 1000:8.1f} ms\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    asyncio.run(benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import TYPE_CHECKING, Final
+
+import orjson
+from aiohttp import web
+from genshin import Game
+from loguru import logger
+
+from api.codes.sources import CODE_URLS, CodeSource
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+CODE_PREFIX: Final[str] = "BENCH"
+"""Prefix of every synthetic code, used to clean them up from the database."""
+
+GAME_CODE_TAGS: Final[dict[Game, str]] = {Game.GENSHIN: "GI", Game.STARRAIL: "SR", Game.ZZZ: "ZZ"}
+GAME_REWARDS: Final[dict[Game, list[tuple[str, int]]]] = {
+    Game.GENSHIN: [("Primogem", 60), ("Mora", 10000), ("Hero's Wit", 5)],
+    Game.STARRAIL: [("Stellar Jade", 60), ("Credit", 5000), ("Traveler's Guide", 3)],
+    Game.ZZZ: [("Polychrome", 60), ("Dennies", 10000), ("Senior Investigator Log", 2)],
+}
+
+
+def generate_codes(game: Game, count: int) -> list[tuple[str, list[tuple[str, int]]]]:
+    """Generate ``count`` deterministic codes and their rewards for a game."""
+    rewards = GAME_REWARDS[game]
+    return [
+        (f"{CODE_PREFIX}{GAME_CODE_TAGS[game]}{i:05d}", rewards[: i % len(rewards) + 1])
+        for i in range(count)
+    ]
+
+
+def _fandom_response(wikitext: str) -> str:
+    data = {"query": {"pages": {"1": {"revisions": [{"slots": {"main": {"*": wikitext}}}]}}}}
+    return orjson.dumps(data).decode()
+
+
+def _item_list(rewards: list[tuple[str, int]]) -> str:
+    return "{{Item List|" + ";".join(f"{name}*{amount}" for name, amount in rewards) + "}}"
+
+
+def _gamesradar(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    lis = "".join(
+        f"<li><strong>{code}</strong> – {', '.join(f'{amount} {name}' for name, amount in rewards)}</li>"  # noqa: RUF001
+        for code, rewards in codes
+    )
+    return f'<html><body><div id="article-body"><ul>{lis}</ul></div></body></html>'
+
+
+def _pockettactics(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    lis = "".join(
+        f"<li><strong>{code}</strong> - {' and '.join(f'{amount}x {name}' for name, amount in rewards)} (new!)</li>"
+        for code, rewards in codes
+    )
+    return f'<html><body><div class="entry-content"><ul>{lis}</ul></div></body></html>'
+
+
+def _prydwen(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    divs = "".join(
+        f'<div><p class="code">{code}</p><p class="rewards">{", ".join(f"{name} x{amount}" for name, amount in rewards)}</p></div>'
+        for code, rewards in codes
+    )
+    return f'<html><body><div class="codes">{divs}</div></body></html>'
+
+
+def _gi_fandom(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    rows = "\n".join(f"{{{{Code Row|{code}|G|{_item_list(rewards)}}}}}" for code, rewards in codes)
+    return _fandom_response(rows)
+
+
+def _hsr_fandom(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    rows = "\n".join(
+        f"{{{{Redemption Code Row|{code}|2024-01-01|G|{_item_list(rewards)}}}}}"
+        for code, rewards in codes
+    )
+    return _fandom_response(f"<!-- active -->\n{rows}\n<!-- expired -->\n")
+
+
+def _zzz_fandom(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    rows = "\n".join(
+        f"{{{{Redemption Code Row|{code}|G|{_item_list(rewards)}}}}}" for code, rewards in codes
+    )
+    return _fandom_response(
+        f"{{{{Redemption Code Container|\n<!-- active -->\n{rows}\n<!-- expired -->\n}}}}"
+    )
+
+
+def _hoyolab(codes: list[tuple[str, list[tuple[str, int]]]]) -> str:
+    bonuses = [{"exchange_code": code} for code, _ in codes]
+    data = {
+        "data": {"modules": [{"exchange_group": None}, {"exchange_group": {"bonuses": bonuses}}]}
+    }
+    return orjson.dumps(data).decode()
+
+
+PAGE_RENDERERS: Final[
+    dict[CodeSource, tuple[str, Callable[[list[tuple[str, list[tuple[str, int]]]]], str]]]
+] = {
+    CodeSource.GAMESRADAR: ("text/html", _gamesradar),
+    CodeSource.POCKETTACTICS: ("text/html", _pockettactics),
+    CodeSource.PRYDWEN: ("text/html", _prydwen),
+    CodeSource.GI_FANDOM: ("application/json", _gi_fandom),
+    CodeSource.HSR_FANDOM: ("application/json", _hsr_fandom),
+    CodeSource.ZZZ_FANDOM: ("application/json", _zzz_fandom),
+    CodeSource.HOYOLAB: ("application/json", _hoyolab),
+}
+
+
+def render_page(source: CodeSource, game: Game, code_count: int) -> tuple[str, str]:
+    """Render a synthetic page for a source.
+
+    Every source reports a slightly different subset of the game's codes so the
+    merge step sees both overlapping and unique codes. HoYoLAB only reports a handful,
+    like it does outside of livestreams.
+
+    Returns:
+        The content type and the body of the page.
+    """
+    codes = generate_codes(game, code_count)
+    if source is CodeSource.HOYOLAB:
+        codes = codes[:3]
+    else:
+        rng = random.Random(f"{game}-{source}")
+        codes = [code for code in codes if rng.random() > 0.2]
+
+    content_type, renderer = PAGE_RENDERERS[source]
+    return content_type, renderer(codes)
+
+
+class SourceStub:
+    """Local HTTP server that stands in for the code sources in ``CODE_URLS``.
+
+    Pages are served from ``pages_dir/<game>/<source>.(html|json)`` when such a recorded
+    page exists, otherwise a synthetic page with ``code_count`` codes is rendered.
+
+    Args:
+        code_count: Number of synthetic codes per game.
+        latency: Base latency in seconds added to every response.
+        jitter: Maximum random latency in seconds added on top of ``latency``.
+        error_rate: Fraction of requests answered with a 503 error.
+        pages_dir: Directory containing recorded pages.
+    """
+
+    def __init__(
+        self,
+        *,
+        code_count: int = 50,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        pages_dir: Path | None = None,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+
+        self._rng = random.Random(0)
+        self._pages: dict[tuple[str, str], tuple[str, str]] = {}
+        for game, sources in CODE_URLS.items():
+            for source in sources:
+                self._pages[game.value, source.value] = self._load_page(
+                    source, game, code_count, pages_dir
+                )
+
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    @staticmethod
+    def _load_page(
+        source: CodeSource, game: Game, code_count: int, pages_dir: Path | None
+    ) -> tuple[str, str]:
+        if pages_dir is not None:
+            for suffix, content_type in ((".html", "text/html"), (".json", "application/json")):
+                path = pages_dir / game.value / f"{source.value}{suffix}"
+                if path.exists():
+                    logger.info(f"Using recorded page {path}")
+                    return content_type, path.read_text(encoding="utf-8")
+        return render_page(source, game, code_count)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        delay = self.latency + self._rng.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="Injected error")
+
+        page = self._pages.get((request.match_info["game"], request.match_info["source"]))
+        if page is None:
+            return web.Response(status=404)
+
+        content_type, body = page
+        return web.Response(text=body, content_type=content_type)
+
+    def url_for(self, game: Game, source: CodeSource) -> str:
+        return f"{self.base_url}/{game.value}/{source.value}"
+
+    def patch_code_urls(self) -> None:
+        """Point every URL in ``CODE_URLS`` to this stub."""
+        for game, sources in CODE_URLS.items():
+            for source in sources:
+                sources[source] = self.url_for(game, source)
+
+    async def start(self, host: str, port: int) -> None:
+        app = web.Application()
+        app.router.add_get("/{game}/{source}", self._handle)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        self.base_url = f"http://{host}:{port}"
+        logger.info(f"Source stub listening on {self.base_url}")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
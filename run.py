@@ -10,4 +10,11 @@ from api.config import settings
 
 if __name__ == "__main__":
     with suppress(KeyboardInterrupt, asyncio.CancelledError):
-        uvicorn.run(app, host=settings.host, port=settings.port, log_config=None, log_level=None)
+        uvicorn.run(
+            app,
+            host=settings.host,
+            port=settings.port,
+            log_config=None,
+            log_level=None,
+            access_log=settings.access_log_sample_rate > 0,
+        )